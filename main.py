@@ -1,18 +1,25 @@
 from fastapi import FastAPI, HTTPException
+import asyncio
+import atexit
+import collections
 import os
-import time
 import json
-import subprocess
 import logging
-import boto3
+import aioboto3
 import tempfile
 from datetime import datetime  # Import datetime module
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from botocore.config import Config
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 
 # Initialize FastAPI app
 app = FastAPI()
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Default to INFO (override with LOG_LEVEL) so boto3 responses are not
+# serialized into debug strings on every request
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 # Constants
@@ -20,18 +27,83 @@ OUTPUT_DIR = "output"
 AWS_REGION = "ap-southeast-1"  # Set your AWS region
 INSTANCE_TAG_NAME = "PostgresPrimary"  # Adjust the tag used for instance identification
 KEY_PAIR_NAME = "PostgresKey"  # Name of the key pair to create
-
-# Ensure the output directory exists
-if not os.path.exists(OUTPUT_DIR):
-    try:
-        os.makedirs(OUTPUT_DIR)
-        logger.info(f"Created directory: {OUTPUT_DIR}")
-    except Exception as e:
-        logger.error(f"Failed to create directory {OUTPUT_DIR}: {e}")
-        raise
-
-# Initialize AWS EC2 client
-ec2_client = boto3.client("ec2", region_name=AWS_REGION)
+_PRIMARY_NAME = "PostgresPrimary"  # Name prefixes assigned by the Terraform config
+_REPLICA_NAME = "PostgresReplica"
+
+# Ensure the output directory exists; exist_ok avoids the exists/create race
+try:
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+except Exception as e:
+    logger.error("Failed to create directory %s: %s", OUTPUT_DIR, e)
+    raise
+
+# Load the Terraform/Ansible templates once at import; compiled templates are
+# cached in-process (cache_size=-1) and on disk across restarts (bytecode cache)
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+# App-specific bytecode-cache directory so worker restarts (and other
+# processes in the container) share compiled templates without clashing with
+# unrelated Jinja users in /tmp
+_JINJA_CACHE_DIR = "/tmp/pg-replication-jinja"
+os.makedirs(_JINJA_CACHE_DIR, exist_ok=True)
+_ENV = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    bytecode_cache=FileSystemBytecodeCache(directory=_JINJA_CACHE_DIR, pattern="__jinja2_%s.cache"),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,
+    cache_size=-1,
+)
+# The playbook takes no per-request variables, so render and encode it once at
+# import instead of on every /generate-code call
+_ANSIBLE_PLAYBOOK_BYTES = _ENV.get_template("setup.yml.j2").render().encode("utf-8")
+
+# The Terraform config has only three interpolation points, so a frozen
+# %-format string is cheaper than a template render per request
+_TF_FMT = """\
+resource "aws_key_pair" "postgres_key" {
+    key_name = "%(key_pair_name)s"
+    public_key = file("~/.ssh/id_rsa.pub")
+}
+
+resource "aws_instance" "postgres_primary" {
+    ami           = "ami-06650ca7ed78ff6fa"
+    instance_type = "%(instance_type)s"
+    key_name      = aws_key_pair.postgres_key.key_name
+    tags = {
+        Name = "PostgresPrimary"
+    }
+}
+
+resource "aws_instance" "postgres_replicas" {
+    count         = %(num_replicas)d
+    ami           = "ami-06650ca7ed78ff6fa"
+    instance_type = "%(instance_type)s"
+    key_name      = aws_key_pair.postgres_key.key_name
+    tags = {
+        Name = "PostgresReplica-${count.index + 1}"
+    }
+}
+"""
+
+# Bounded executor for the blocking file-system helpers so they cannot
+# saturate the event loop's default thread pool
+_EXEC = ThreadPoolExecutor(max_workers=4)
+
+# Shared botocore config: one keep-alive connection pool with adaptive retries
+# instead of per-call defaults, so retried EC2 calls reuse the TLS session
+_BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=10,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+)
+
+# Lazily create the aioboto3 session so importing the module does not resolve
+# AWS credentials; all callers share the one cached session
+@lru_cache(maxsize=None)
+def _aws_session():
+    return aioboto3.Session()
 
 # Custom JSON serializer to handle datetime objects
 def json_serializer(obj):
@@ -39,41 +111,158 @@ def json_serializer(obj):
         return obj.isoformat()
     raise TypeError(f"Type {type(obj)} not serializable")
 
-# Function to fetch instance IPs based on tags
-def fetch_instance_ips():
-    instances = ec2_client.describe_instances(
-        Filters=[
-            {'Name': 'tag:Name', 'Values': ['PostgresPrimary', 'PostgresReplica*']},
-            {'Name': 'instance-state-name', 'Values': ['running']}
-        ]
-    )
-    instance_ips = []
-    for reservation in instances['Reservations']:
-        for instance in reservation['Instances']:
-            # Consider instances with a public IP
-            public_ip = instance.get('PublicIpAddress')
-            tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
-            instance_ips.append({
-                'id': instance['InstanceId'],
-                'ip': public_ip,
-                'username': 'ubuntu',
-                'tags': tags,
-            })
-            logger.debug(f"Instance tags: {tags}, Public IP: {public_ip}")
-    return instance_ips
-
-
-# Function to create a temporary PEM file for SSH
-def create_temp_pem_file(pem_content):
+# Function to fetch instance IPs based on tags, partitioned into primaries and
+# replicas in the same pass
+async def fetch_and_partition_ips():
+    primaries = []
+    replicas = []
+    async with _aws_session().client("ec2", region_name=AWS_REGION, config=_BOTO_CONFIG) as ec2_client:
+        # Wait for the tagged instances to reach the running state instead of
+        # polling with fixed sleeps (the instance-status waiters do not accept
+        # tag filters, so wait on instance_running)
+        logger.info("Waiting for instances to reach the running state...")
+        waiter = ec2_client.get_waiter('instance_running')
+        await waiter.wait(
+            Filters=[
+                {'Name': 'tag:Name', 'Values': ['PostgresPrimary', 'PostgresReplica*']},
+                # Restrict to pending/running: terminated instances keep their
+                # tags for a while after a re-apply replaces them, and the
+                # waiter treats a matched terminated instance as failure
+                {'Name': 'instance-state-name', 'Values': ['pending', 'running']}
+            ],
+            WaiterConfig={'Delay': 10, 'MaxAttempts': 30}
+        )
+
+        paginator = ec2_client.get_paginator('describe_instances')
+        pages = paginator.paginate(
+            Filters=[
+                {'Name': 'tag:Name', 'Values': ['PostgresPrimary', 'PostgresReplica*']},
+                {'Name': 'instance-state-name', 'Values': ['running']}
+            ]
+        )
+        async for page in pages:
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    # Consider instances with a public IP; only the Name tag
+                    # is ever consulted, so skip building a full tag dict
+                    public_ip = instance.get('PublicIpAddress')
+                    name = next((tag['Value'] for tag in instance.get('Tags', ()) if tag['Key'] == 'Name'), '')
+                    # Names come straight from the Terraform config, so a
+                    # prefix compare classifies without lowering or scanning
+                    if name.startswith(_PRIMARY_NAME):
+                        bucket = primaries
+                    elif name.startswith(_REPLICA_NAME):
+                        bucket = replicas
+                    else:
+                        continue
+                    bucket.append({
+                        'id': instance['InstanceId'],
+                        'ip': public_ip,
+                        'username': 'ubuntu',
+                        'name': name,
+                    })
+                    logger.debug("Instance name: %s, Public IP: %s", name, public_ip)
+    return primaries, replicas
+
+
+# Function to remove a temp PEM file at exit without failing if already gone
+def _unlink_quiet(path):
     try:
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_file.write(pem_content.encode())
-        temp_file.close()
-        logger.info(f"Temporary PEM file created at {temp_file.name}")
-        return temp_file.name
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+# Function to create a temporary PEM file for SSH; memoized so repeated applies
+# with the same key reuse the file instead of rewriting it
+@lru_cache(maxsize=4)
+def create_temp_pem_file(pem_bytes):
+    try:
+        fd, path = tempfile.mkstemp(suffix=".pem")
+        try:
+            os.write(fd, pem_bytes)
+            os.fchmod(fd, 0o600)  # SSH refuses keys with looser permissions
+        finally:
+            os.close(fd)
+        atexit.register(_unlink_quiet, path)
+        logger.info("Temporary PEM file created at %s", path)
+        return path
     except Exception as e:
-        logger.error(f"Error creating temporary PEM file: {e}")
+        logger.error("Error creating temporary PEM file: %s", e)
+        raise
+
+# Function to write a whole file as one open/write/close syscall sequence,
+# skipping the TextIOWrapper encoding and buffering layers
+def _write_file_bytes(path, payload, mode=0o644):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+
+# Function to fetch the Terraform-managed private key. 'terraform output'
+# reparses the entire state file, so the PEM is cached on disk keyed by the
+# state file's mtime and the subprocess is skipped while the state is unchanged
+async def _terraform_private_key():
+    cache_path = None
+    try:
+        state_mtime = os.stat(os.path.join(OUTPUT_DIR, "terraform.tfstate")).st_mtime_ns
+        cache_path = os.path.join(OUTPUT_DIR, f".pk-{state_mtime}.pem")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as cache_file:
+                return cache_file.read()
+    except OSError:
+        pass  # no state file yet; fall through to terraform output
+
+    # Keep the PEM as bytes end-to-end; only stderr needs decoding for logs
+    process = await asyncio.create_subprocess_exec(
+        "terraform", "output", "-raw", "private_key",
+        cwd=OUTPUT_DIR,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    pem_bytes, key_stderr = await process.communicate()
+    if process.returncode != 0:
+        logger.error("Fetching private key failed: %s", key_stderr.decode())
+        raise HTTPException(status_code=500, detail=key_stderr.decode())
+    if cache_path is not None:
+        _write_file_bytes(cache_path, pem_bytes, mode=0o600)
+    return pem_bytes
+
+# Ansible can emit single lines far beyond asyncio's default 64 KiB stream
+# limit (registered command output, JSON module results)
+_STREAM_LINE_LIMIT = 16 * 1024 * 1024
+
+# Function to run a subprocess while streaming its output to the logger,
+# keeping only a bounded tail in memory for the HTTP response
+async def stream_command(command, cwd=None, timeout=None):
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=_STREAM_LINE_LIMIT,
+    )
+    tail = collections.deque(maxlen=200)
+
+    async def _pump():
+        async for line in process.stdout:
+            decoded = line.decode(errors="replace")
+            tail.append(decoded)
+            logger.info(decoded.rstrip())
+        return await process.wait()
+
+    try:
+        returncode = await asyncio.wait_for(_pump(), timeout=timeout)
+    except BaseException:
+        # Kill on timeout, cancellation or a read error alike so the child
+        # never keeps running detached after the request fails
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
         raise
+    return returncode, "".join(tail)
 
 # Endpoint to generate Terraform and Ansible configurations
 @app.post("/generate-code")
@@ -87,186 +276,24 @@ async def generate_code(config: dict):
         shared_buffers = config.get("shared_buffers", "128MB")
 
         # Generate Terraform configuration
-        terraform_config = f"""
-        resource "aws_key_pair" "postgres_key" {{
-            key_name = "{KEY_PAIR_NAME}"
-            public_key = file("~/.ssh/id_rsa.pub")
-        }}
-
-        resource "aws_instance" "postgres_primary" {{
-            ami           = "ami-06650ca7ed78ff6fa"
-            instance_type = "{instance_type}"
-            key_name      = aws_key_pair.postgres_key.key_name
-            tags = {{
-                Name = "PostgresPrimary"
-            }}
-        }}
-
-        resource "aws_instance" "postgres_replicas" {{
-            count         = {num_replicas}
-            ami           = "ami-06650ca7ed78ff6fa"
-            instance_type = "{instance_type}"
-            key_name      = aws_key_pair.postgres_key.key_name
-            tags = {{
-                Name = "PostgresReplica-${{count.index + 1}}"
-            }}
-        }}
-        """
+        terraform_config = _TF_FMT % {
+            "key_pair_name": KEY_PAIR_NAME,
+            "instance_type": instance_type,
+            "num_replicas": int(num_replicas),
+        }
         terraform_file = os.path.join(OUTPUT_DIR, "main.tf")
-        with open(terraform_file, "w") as tf_file:
-            tf_file.write(terraform_config)
-        logger.info(f"Terraform configuration saved to {terraform_file}")
-
-        # Generate Ansible playbook
-        ansible_playbook = f"""
-        - name: Setup PostgreSQL replication
-          hosts: all
-          become: yes
-          tasks:
-            - name: Install PostgreSQL and dependencies
-              apt:
-                name:
-                  - postgresql
-                  - postgresql-contrib
-                state: present
-                update_cache: yes
-
-            - name: Ensure pip3 is installed
-              apt:
-                name: python3-pip
-                state: present
-                update_cache: yes
-
-            - name: Install psycopg2 system package (via apt)
-              apt:
-                name: python3-psycopg2
-                state: present
-                update_cache: yes
-
-            - name: Get PostgresSQL version
-              command: psql --version
-              register: pg_version_output
-              changed_when: false
-
-            - name: Parse PostgreSQL version
-              set_fact:
-                pg_version: "{{{{ pg_version_output.stdout.split(' ')[2].split('.')[0] }}}}"
-
-        - name: Configure primary PostgreSQL server for replication
-          hosts: primary
-          become: yes
-          vars:
-            postgres_password: test
-            replication_password: rep
-          tasks:
-            - name: Ensure PostgreSQL service is started and enabled
-              service:
-                name: postgresql
-                state: started
-                enabled: yes
-
-            - name: Modify pg_hba.conf to allow trust authentication temporarily
-              lineinfile:
-                path: /etc/postgresql/{{{{ pg_version }}}}/main/pg_hba.conf
-                regexp: '^local\s+all\s+postgres'
-                line: "local   all             postgres                                trust"
-                state: present
-
-            - name: Reload PostgreSQL to apply changes to pg_hba.conf
-              command: systemctl reload postgresql
-
-            - name: Set password for postgres user directly via psql command (with sudo)
-              command: sudo -u postgres psql -c "ALTER USER postgres WITH PASSWORD '{{{{ postgres_password }}}}';"
-
-            - name: Create replication user
-              postgresql_user:
-                name: replication
-                password: "{{{{ replication_password }}}}"
-                role_attr_flags: "LOGIN,REPLICATION"
-                db: postgres
-                state: present
-                login_user: postgres
-                login_password: "{{{{ postgres_password }}}}"
-                login_host: localhost
-
-            - name: Revert pg_hba.conf to md5 authentication for postgres
-              lineinfile:
-                path: /etc/postgresql/{{{{ pg_version }}}}/main/pg_hba.conf
-                regexp: '^local\s+all\s+postgres'
-                line: "local   all             postgres                                md5"
-                state: present
-
-            - name: Reload PostgreSQL to apply changes to pg_hba.conf
-              command: systemctl reload postgresql
-
-            - name: Restart PostgreSQL to apply changes
-              service:
-                name: postgresql
-                state: restarted
-
-
-        - name: Configure replica PostgreSQL server for replication
-          hosts: replica
-          become: yes
-          tasks:
-            - name: Ensure PostgreSQL service is stopped before configuration (if running)
-              service:
-                name: postgresql
-                state: stopped
-              when: ansible_facts.services['postgresql'] is defined and ansible_facts.services['postgresql'].state == 'running'
-
-            - name: Remove existing data directory on replica (if any)
-              file:
-                path: /var/lib/postgresql/{{{{ pg_version }}}}/main
-                state: absent
-              when: ansible_facts.services['postgresql'] is defined and ansible_facts.services['postgresql'].state == 'stopped'
-
-            - name: Perform base backup from primary server
-              command: >
-                pg_basebackup -h {{{{ groups['primary'][0] }}}} -U replication -D /var/lib/postgresql/{{{{ pg_version }}}}/main -P -R -X stream
-              become: yes
-              become_method: sudo
-              become_user: postgres
-              delegate_to: "{{{{ groups['primary'][0] }}}}"
-              environment:
-                PGUSER: replication
-                PGPASSWORD: "{{{{ replication_password }}}}"
-              when: ansible_facts.services['postgresql'] is defined and ansible_facts.services['postgresql'].state == 'stopped'
-
-            - name: Ensure correct file permissions for PostgreSQL directory on replica
-              file:
-                path: /var/lib/postgresql/{{{{ pg_version }}}}/main
-                state: directory
-                owner: postgres
-                group: postgres
-                mode: '0755'
-              become: yes
-              become_user: root
-
-            - name: Configure recovery.conf for replication on replica
-              copy:
-                content: |
-                  standby_mode = 'on'
-                  primary_conninfo = 'host={{{{ groups['primary'][0] }}}} port=5432 user=replication password={{{{ replication_password }}}}'
-                  trigger_file = '/tmp/postgresql.trigger.5432'
-                dest: /var/lib/postgresql/{{{{ pg_version }}}}/main/recovery.conf
-                owner: postgres
-                group: postgres
-                mode: '0644'
-
-            - name: Start PostgreSQL service on replica
-              service:
-                name: postgresql
-                state: started
-        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_EXEC, _write_file_bytes, terraform_file, terraform_config.encode("utf-8"))
+        logger.info("Terraform configuration saved to %s", terraform_file)
+
+        # Write the precomputed Ansible playbook
         ansible_file = os.path.join(OUTPUT_DIR, "setup.yml")
-        with open(ansible_file, "w") as ans_file:
-            ans_file.write(ansible_playbook)
-        logger.info(f"Ansible playbook saved to {ansible_file}")
+        await loop.run_in_executor(_EXEC, _write_file_bytes, ansible_file, _ANSIBLE_PLAYBOOK_BYTES)
+        logger.info("Ansible playbook saved to %s", ansible_file)
 
         return {"message": "Terraform and Ansible configurations generated successfully"}
     except Exception as e:
-        logger.error(f"Error generating configurations: {e}")
+        logger.error("Error generating configurations: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Endpoint to plan infrastructure
@@ -275,13 +302,13 @@ async def generate_code(config: dict):
 async def plan_infrastructure():
     try:
         command = ["terraform", "plan"]
-        result = subprocess.run(command, cwd=OUTPUT_DIR, capture_output=True, text=True)
-        if result.returncode != 0:
-            logger.error(f"Terraform plan failed: {result.stderr}")
-            raise HTTPException(status_code=500, detail=result.stderr)
-        return {"message": "Terraform plan successful", "output": result.stdout}
+        returncode, output = await stream_command(command, cwd=OUTPUT_DIR)
+        if returncode != 0:
+            logger.error("Terraform plan failed: %s", output)
+            raise HTTPException(status_code=500, detail=output)
+        return {"message": "Terraform plan successful", "output": output}
     except Exception as e:
-        logger.error(f"Error running Terraform plan: {e}")
+        logger.error("Error running Terraform plan: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -293,68 +320,49 @@ async def apply_infrastructure():
     try:
         # Run Terraform apply
         command = ["terraform", "apply", "-auto-approve"]
-        result = subprocess.run(command, cwd=OUTPUT_DIR, capture_output=True, text=True)
-        if result.returncode != 0:
-            logger.error(f"Terraform apply failed: {result.stderr}")
-            raise HTTPException(status_code=500, detail=result.stderr)
-
-        # Retry fetching instance IPs up to 5 times
-        for attempt in range(5):
-            logger.info(f"Attempt {attempt + 1}/5 to fetch instance IPs...")
-            instance_ips = fetch_instance_ips()
-
-            # Filter primary and replica IPs
-            primary_ips = [info for info in instance_ips if 'postgresprimary' in info['tags'].get('Name', '').lower()]
-            replica_ips = [info for info in instance_ips if 'postgresreplica' in info['tags'].get('Name', '').lower()]
-
-            logger.debug(f"Primary IPs: {primary_ips}")
-            logger.debug(f"Replica IPs: {replica_ips}")
-
-            # If all required IPs are fetched, proceed to create the inventory file
-            if len(primary_ips) >= 1 and len(replica_ips) >= 1:
-                logger.info("Successfully fetched primary and replica IPs.")
-
-                # Create the inventory file
-                inventory_file = os.path.join(OUTPUT_DIR, "inventory.ini")
-                with open(inventory_file, "w") as inv_file:
-                    # Write primary instances to the inventory file
-                    inv_file.write("[primary]\n")
-                    for info in primary_ips:
-                        inv_file.write(f"{info['username']}@{info['ip']} ansible_python_interpreter=/usr/bin/python3\n")
-
-                    # Write replica instances to the inventory file
-                    inv_file.write("[replica]\n")
-                    for info in replica_ips:
-                        inv_file.write(f"{info['username']}@{info['ip']} ansible_python_interpreter=/usr/bin/python3\n")
-
-                    # Write common variables to the inventory file
-                    inv_file.write("\n[all:vars]\n")
-                    inv_file.write("replication_password=rep\n")
-
-                logger.info(f"Inventory file created at {inventory_file}")
-
-                # Fetch private key content from Terraform output and create a temp PEM file
-                private_key_content = subprocess.check_output(
-                    ["terraform", "output", "-raw", "private_key"],
-                    cwd=OUTPUT_DIR
-                ).decode("utf-8")
-                private_key_path = create_temp_pem_file(private_key_content)
-
-                # Set the private key path in Ansible configuration
-                os.environ["ANSIBLE_PRIVATE_KEY_FILE"] = private_key_path
-
-                return {"message": "Infrastructure applied and inventory file created successfully"}
-
-            # Wait before retrying
-            logger.warning(f"Retrying to fetch instance IPs in 15 seconds...")
-            time.sleep(15)
-
-        # Raise an exception if unable to fetch required IPs
-        logger.error("Failed to fetch instance IPs after multiple retries.")
-        raise HTTPException(status_code=500, detail="Failed to fetch instance IPs")
+        returncode, output = await stream_command(command, cwd=OUTPUT_DIR)
+        if returncode != 0:
+            logger.error("Terraform apply failed: %s", output)
+            raise HTTPException(status_code=500, detail=output)
+
+        # Overlap the EC2 lookup with the private-key fetch; the two are
+        # independent I/O operations
+        (primary_ips, replica_ips), private_key_content = await asyncio.gather(
+            fetch_and_partition_ips(),
+            _terraform_private_key(),
+        )
+
+        logger.debug("Primary IPs: %s", primary_ips)
+        logger.debug("Replica IPs: %s", replica_ips)
+
+        if len(primary_ips) < 1 or len(replica_ips) < 1:
+            logger.error("Failed to fetch instance IPs after waiting for instances.")
+            raise HTTPException(status_code=500, detail="Failed to fetch instance IPs")
+
+        logger.info("Successfully fetched primary and replica IPs.")
+
+        # Assemble the whole inventory in memory and write it with one syscall
+        inventory_file = os.path.join(OUTPUT_DIR, "inventory.ini")
+        parts = ["[primary]\n"]
+        parts.extend(f"{info['username']}@{info['ip']} ansible_python_interpreter=/usr/bin/python3\n" for info in primary_ips)
+        parts.append("[replica]\n")
+        parts.extend(f"{info['username']}@{info['ip']} ansible_python_interpreter=/usr/bin/python3\n" for info in replica_ips)
+        parts.append("\n[all:vars]\nreplication_password=rep\n")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_EXEC, _write_file_bytes, inventory_file, "".join(parts).encode("utf-8"))
+
+        logger.info("Inventory file created at %s", inventory_file)
+
+        # Create a temp PEM file from the private key fetched above
+        private_key_path = create_temp_pem_file(private_key_content)
+
+        # Set the private key path in Ansible configuration
+        os.environ["ANSIBLE_PRIVATE_KEY_FILE"] = private_key_path
+
+        return {"message": "Infrastructure applied and inventory file created successfully"}
 
     except Exception as e:
-        logger.error(f"Error running Terraform apply: {e}")
+        logger.error("Error running Terraform apply: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -368,20 +376,19 @@ async def configure_database():
         
         # Run the Ansible playbook with the dynamically created inventory
         command = ["ansible-playbook", "setup.yml", "-i", "inventory.ini"]
-        result = subprocess.run(command, cwd=OUTPUT_DIR, capture_output=True, text=True, timeout=3600)  # Added timeout for long-running tasks
-        
+        returncode, output = await stream_command(command, cwd=OUTPUT_DIR, timeout=3600)  # Added timeout for long-running tasks
+
         # Log the output or error
-        logger.info(f"Ansible playbook executed with return code {result.returncode}")
-        if result.returncode != 0:
-            logger.error(f"Ansible playbook execution failed: {result.stderr}")
-            raise HTTPException(status_code=500, detail=result.stderr)
-        
-        logger.info(f"Ansible playbook output: {result.stdout}")
-        return {"message": "Database configuration successful", "output": result.stdout}
-    
-    except subprocess.TimeoutExpired as e:
-        logger.error(f"Ansible playbook execution timed out: {e}")
+        logger.info("Ansible playbook executed with return code %s", returncode)
+        if returncode != 0:
+            logger.error("Ansible playbook execution failed: %s", output)
+            raise HTTPException(status_code=500, detail=output)
+
+        return {"message": "Database configuration successful", "output": output}
+
+    except asyncio.TimeoutError as e:
+        logger.error("Ansible playbook execution timed out: %s", e)
         raise HTTPException(status_code=500, detail="Ansible playbook execution timed out")
     except Exception as e:
-        logger.error(f"Error running Ansible playbook: {e}")
+        logger.error("Error running Ansible playbook: %s", e)
         raise HTTPException(status_code=500, detail=str(e))